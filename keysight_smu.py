@@ -6,7 +6,9 @@ copyright 2020 buck smith
 """
 
 import datetime
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Union
 import numpy as np
 import pyvisa as visa
@@ -32,7 +34,47 @@ class Channels:
     CH2 = 2
 
 
+class _LockedSession:
+    """
+    wraps a visa resource so write/query transfers from channel threads
+    are serialized; other attributes (timeout, close...) pass through
+    hold lock to keep a multi-query sequence together
+    """
+
+    def __init__(self, resource):
+        object.__setattr__(self, "_resource", resource)
+        object.__setattr__(self, "lock", threading.RLock())
+
+    def write(self, *args, **kwargs):
+        with self.lock:
+            return self._resource.write(*args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        with self.lock:
+            return self._resource.query(*args, **kwargs)
+
+    def query_binary_values(self, *args, **kwargs):
+        with self.lock:
+            return self._resource.query_binary_values(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resource, name, value)
+
+
 class KeysightSMU(IInstrument):
+    # shared by all SMUs in the process - list_resources() enumeration is slow
+    _rm = None
+    _resource_cache = None
+    # :SYST:ERR:CODE:ALL? reply for an empty error queue
+    _OK = "+0\n"
+    # accepted channel arguments and their SCPI suffix
+    _CH = {1: "1", 2: "2", "1": "1", "2": "2"}
+    # wait on *OPC? after output changes, False restores the fixed sleeps
+    FAST_SETTLE = True
+
     def __init__(self, **kwargs):
         """
         verify instrument exists in visa resource manager
@@ -52,6 +94,20 @@ class KeysightSMU(IInstrument):
         self._nplc = 2
         self.aper = 0.005
         self._session = None
+        self._binary_data = False
+        self._pool = None
+        # per channel SCPI templates, only the value is formatted on the hot path
+        self._tpl = {
+            ch: {
+                "aper": f":SENS{ch}:CURR:APER %s",
+                "trig_tim": f":TRIG{ch}:ACQ:TIM %s",
+                "trig_cnt": f":TRIG{ch}:ACQ:COUN %s",
+                "outp_on": f":OUTP{ch}:STAT ON",
+                "meas_v": f":MEAS:VOLT? (@{ch})",
+                "meas_i": f":MEAS:CURR? (@{ch})",
+            }
+            for ch in ("1", "2")
+        }
         self._port_handle = ""
         try:
             self.Channels = Channels()
@@ -66,12 +122,14 @@ class KeysightSMU(IInstrument):
         Performs resets and queries instrument ID info
         """
         try:
-            rm = visa.ResourceManager()
+            if KeysightSMU._rm is None:
+                KeysightSMU._rm = visa.ResourceManager()
             # If visa_addr hasn't yet been specified (specified in config.json or by ip address), find USB device
             if not self.visa_addr:
-                instr_list = rm.list_resources()
-                self.visa_addr = [addr for addr in instr_list if self.serial_number in addr][0]
-            self._session = rm.open_resource(self.visa_addr)
+                if KeysightSMU._resource_cache is None:
+                    KeysightSMU._resource_cache = KeysightSMU._rm.list_resources()
+                self.visa_addr = next(a for a in KeysightSMU._resource_cache if self.serial_number in a)
+            self._session = _LockedSession(KeysightSMU._rm.open_resource(self.visa_addr))
             self._session.write_termination = "\n"
             self._session.timeout = 4000
 
@@ -92,6 +150,8 @@ class KeysightSMU(IInstrument):
             finally:
                 if self.serial_number == "":
                     log.error("Unable to find Keysight SMU serial number")
+            self._enable_error_trap()
+            self._set_data_format()
 
         except Exception as ex:
             log.exception(
@@ -101,8 +161,85 @@ class KeysightSMU(IInstrument):
                 "Error connecting to SMU - check SMU power, network connection, and serial number"
             )
 
+    def _enable_error_trap(self):
+        """
+        clear status and route command, execution, device and query errors
+        (ESE 60) into the ESB bit of the status byte (SRE 32) so methods
+        only need one *STB? poll instead of an error query per command
+        """
+        self._session.write("*CLS;*ESE 60;*SRE 32")
+
+    def _check_status(self, id="") -> str:
+        """
+        poll the status byte once and only read the error queue if ESB is set
+        returns the raw *STB? response
+        """
+        stb = self._session.query("*STB?")
+        if int(stb) & 32:
+            errs = self._session.query(":SYST:ERR:CODE:ALL?")
+            self._session.query("*ESR?")  # clears ESB for the next check
+            self.err_check(errs, id=id)
+        return stb
+
+    def _set_data_format(self):
+        """
+        request measurement data as little endian IEEE-754 REAL,64 blocks
+        falls back to ASCII if the instrument rejects the binary format
+        """
+        self._session.write(":FORM:DATA REAL,64;:FORM:BORD SWAP")
+        try:
+            self._check_status(id="form_data")
+            self._binary_data = True
+        except ValueError:
+            log.info("SMU rejected binary data format, using ASCII")
+            self._session.write(":FORM:DATA ASC")
+            self._binary_data = False
+
+    def _query_values(self, q: str) -> np.ndarray:
+        """ query measurement data and return it as a float64 array"""
+        if self._binary_data:
+            return self._session.query_binary_values(q, datatype="d", container=np.ndarray)
+        return np.fromstring(self._session.query(q), sep=",", dtype=np.float64)
+
+    def _wait_opc(self, seconds: float) -> None:
+        """
+        block on *OPC? until pending acquisitions finish
+        the visa timeout is stretched to seconds plus 2 s margin for the wait
+        """
+        prev_to = self._session.timeout
+        self._session.timeout = max(prev_to, int((seconds + 2) * 1000))
+        try:
+            self._session.query("*OPC?")
+        finally:
+            self._session.timeout = prev_to
+
+    def _settle(self, legacy_delay: float) -> None:
+        """ block until the SMU reports pending operations done, or sleep legacy_delay"""
+        if self.FAST_SETTLE:
+            self._session.query("*OPC?")
+        else:
+            time.sleep(legacy_delay)
+
+    def _write_many(self, cmds: List[str]) -> None:
+        """ send a block of SCPI commands as one semicolon separated transfer"""
+        self._session.write(";".join(cmds))
+
+    @classmethod
+    def refresh_resources(cls) -> None:
+        """ drop the cached visa resource list so the next open() rescans, e.g. after hot-plug"""
+        cls._resource_cache = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """ thread pool for the *_both methods, created on first use"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=2)
+        return self._pool
+
     def close(self):
         """  close visa session"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
         if self._session is not None:
             self._session.close()
             self._session = None
@@ -126,13 +263,10 @@ class KeysightSMU(IInstrument):
 
     def _read_check_caldate(self, kwargs):
         self.calDate = kwargs["calibration_expiration"]
-        compStr = str(int(self.calDate))
-        today = datetime.datetime.now().replace(microsecond=0).strftime("%Y%m%d")
-        if compStr < today:  # string compare works with iso date strings
-            self.calStatus = False
-            log.info(f"Smu Out of Cal")
-        else:
-            self.calStatus = True
+        today_int = int(datetime.date.today().strftime("%Y%m%d"))
+        self.calStatus = int(self.calDate) >= today_int
+        if not self.calStatus:
+            log.info("Smu Out of Cal")
 
     def reset(self) -> None:
         """ perform *RST on smu"""
@@ -140,78 +274,98 @@ class KeysightSMU(IInstrument):
             for channel in [1, 2]:
                 self.channel_off(channel)
             self._session.write("*RST")
+            # *RST returns :FORM:DATA to ASCII
+            self._set_data_format()
 
     # source voltage measure current
     # using commands from https://literature.cdn.keysight.com/litweb/pdf/B2910-90030.pdf?id=1240049
     # modified from 1842 project to be pure _svmi with no power down and sleep(4)
-    def _svmi(self, channel: Union[str, int], volts: float, i_limit: float, settle: float) -> List[float]:
+    def _svmi(self, channel: Union[str, int], volts: float, i_limit: float, settle: float) -> np.ndarray:
         """
         Source voltage measure current function
         default data format returns a list of values for
         VOLTage|CURRent|RESistance|TIME|STATus|SOUR
         """
-        ch = str(channel)
-        if ch in ("1", "2"):
-            try:
-                forcev = f"{volts}"
-                comply = f"{i_limit}"
-                self._session.write(":SENS" + ch + ":CURR:PROT " + comply)
-                self._session.write(":SENS" + ch + ":REM OFF")
-                self._session.write(":SENS" + ch + ':FUNC:ON "VOLT","CURR"')
-                fv = self._session.write(":SOUR" + ch + ":VOLT:LEV:IMM " + forcev)
-                self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"))
-                self._session.write(":SOUR" + ch + ":FUNC:MODE VOLT")
-                self._session.write(":SOUR" + ch + ":FUNC:SHAP DC")
-                self._session.write(":SOUR" + ch + ":VOLT:MODE FIX")
-                self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"))
-                self._session.write(f":SENS{ch}:CURR:DC:NPLC 5")
-                self._session.write(":OUTP" + ch + ":STAT ON")
-                frmEl = self._session.query(":FORM:ELEM:SENS?")
-                self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"))
-                self._session.write(":INIT:IMM:ACQ (@" + ch + ")")
-                time.sleep(settle)
-                self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"))
-                measureds = self._session.query(":SENS" + ch + ":DATA?")
-                meas_np = [float(x) for x in measureds.split(",")]
-                return meas_np
-            except Exception as ex:
-                log.exception("Current measurement exception")
-                raise Exception(f"ERROR: {ex}")
-
-        else:
-            log.error("Invalid SMU Channel")
+        ch = self._CH[channel]
+        try:
+            forcev = f"{volts}"
+            comply = f"{i_limit}"
+            self._write_many([
+                f":SENS{ch}:CURR:PROT {comply}",
+                f":SENS{ch}:REM OFF",
+                f':SENS{ch}:FUNC:ON "VOLT","CURR"',
+                f":SOUR{ch}:VOLT:LEV:IMM {forcev}",
+                f":SOUR{ch}:FUNC:MODE VOLT",
+                f":SOUR{ch}:FUNC:SHAP DC",
+                f":SOUR{ch}:VOLT:MODE FIX",
+                f":SENS{ch}:CURR:DC:NPLC 5",
+                f":OUTP{ch}:STAT ON",
+            ])
+            self._session.write(f":INIT:IMM:ACQ (@{ch})")
+            time.sleep(settle)
+            meas_np = self._query_values(f":SENS{ch}:DATA?")
+            self._check_status(id=f"svmi_ch{ch}")
+            return meas_np
+        except Exception as ex:
+            log.exception("Current measurement exception")
+            raise Exception(f"ERROR: {ex}")
 
     # simple measure of V and I
-    def smu_meas(self, channel: Union[str, int], settle: float, curr_range: float = None, four_wire: bool = False, aper_val: float = None, auto_aper: bool = False) -> (float, float):
+    def smu_meas(self, channel: Union[str, int], settle: float, curr_range: float = None, four_wire: bool = False, aper_val: float = None, auto_aper: bool = False, combined: bool = False) -> (float, float):
         """
         Waits for time settle and then reads voltage and current
+        combined=True reads both with one :MEAS? via meas_vi
         returns V, I
         """
-        channel = str(channel)
+        ch = self._CH[channel]
 
         if four_wire:
-            # print("4-wire enabled = " + self._session.query(f":SENS{channel}:REM?"))
-            self._session.write(f"SENS{channel}:REM {1 if four_wire else 0}")
-            # print("4-wire enabled = " + self._session.query(f":SENS{channel}:REM?"))
+            # print("4-wire enabled = " + self._session.query(f":SENS{ch}:REM?"))
+            self._session.write(f"SENS{ch}:REM {1 if four_wire else 0}")
+            # print("4-wire enabled = " + self._session.query(f":SENS{ch}:REM?"))
 
         if curr_range:
-            self._session.write(f":SENS{channel}:CURR:DC:RANG:UPP {curr_range}")
+            self._session.write(f":SENS{ch}:CURR:DC:RANG:UPP {curr_range}")
 
         if auto_aper:
-            self._session.write(f":SENS{channel}:CURR:DC:APER:AUTO 1")
+            self._session.write(f":SENS{ch}:CURR:DC:APER:AUTO 1")
         elif aper_val:
-            # print("Aperture = " + self._session.query(f":SENS{channel}:CURR:APER?"))
-            self._session.write(f":SENS{channel}:CURR:DC:APER {aper_val}")
-            # print("Aperture = " + self._session.query(f":SENS{channel}:CURR:APER?"))
+            # print("Aperture = " + self._session.query(f":SENS{ch}:CURR:APER?"))
+            self._session.write(f":SENS{ch}:CURR:DC:APER {aper_val}")
+            # print("Aperture = " + self._session.query(f":SENS{ch}:CURR:APER?"))
+
+        if combined:
+            return self.meas_vi(ch, settle)
 
         time.sleep(settle)
 
-        V = self._session.query(f":MEAS:VOLT? (@{channel})")
-        I = self._session.query(f":MEAS:CURR? (@{channel})")
-        V = float(V)
-        I = float(I)
+        tpl = self._tpl[ch]
+        V = float(self._query_values(tpl["meas_v"])[0])
+        I = float(self._query_values(tpl["meas_i"])[0])
         return V, I
 
+    def meas_vi(self, channel: Union[str, int], settle: float) -> (float, float):
+        """
+        Waits for time settle and then reads voltage and current in one :MEAS? query
+        assumes FORM:ELEM:SENS includes VOLT,CURR, which then lead the reply
+        returns V, I
+        """
+        ch = self._CH[channel]
+        self._session.write(f':SENS{ch}:FUNC:ON "VOLT","CURR"')
+        time.sleep(settle)
+        vals = self._query_values(f":MEAS? (@{ch})")
+        return float(vals[0]), float(vals[1])
+
+    def smu_meas_both(self, settle: float) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        """
+        run smu_meas on channels 1 and 2 concurrently so the settle waits overlap
+        returns (V1, I1), (V2, I2)
+        """
+        pool = self._get_pool()
+        f1 = pool.submit(self.smu_meas, Channels.CH1, settle)
+        f2 = pool.submit(self.smu_meas, Channels.CH2, settle)
+        return f1.result(), f2.result()
+
     # use _svmi to source then scan current values
     def source_dci(self, channel: Union[str, int], amps: float, v_comply: float):
         """
@@ -219,22 +373,19 @@ class KeysightSMU(IInstrument):
         comply is current limit in amps
         returns v, i measurements
         """
-        channel = str(channel)
+        ch = self._CH[channel]
         forcei = f"{amps}"
 
-        self._session.write(":SOUR" + channel + ":FUNC:MODE  CURR")
-        fv = self._session.write(":SOUR" + channel + ":CURR:LEV:IMM " + forcei)
-        self._session.write(":SOUR" + channel + ":FUNC:SHAP DC")
-        self._session.write(":SOUR" + channel + ":VOLT:MODE FIX")
-        self._session.write(":SENS" + channel + ":VOLT:PROT " + str(v_comply))
-        er2 = self._session.query(":SYST:ERR:CODE:ALL?")
-        self._session.write(":OUTP" + channel + ":STAT ON")
-        self._session.write(":INIT:IMM:TRAN (@" + channel + ")")
-        er3 = self._session.query(":SYST:ERR:CODE:ALL?")
-        # stb1 = self._session.query("*STB?")
-        time.sleep(0.05)
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="source_dc1")
-        return self.smu_meas(channel, 0.2)
+        self._session.write(f":SOUR{ch}:FUNC:MODE  CURR")
+        fv = self._session.write(f":SOUR{ch}:CURR:LEV:IMM {forcei}")
+        self._session.write(f":SOUR{ch}:FUNC:SHAP DC")
+        self._session.write(f":SOUR{ch}:VOLT:MODE FIX")
+        self._session.write(f":SENS{ch}:VOLT:PROT {v_comply}")
+        self._session.write(f":OUTP{ch}:STAT ON")
+        self._session.write(f":INIT:IMM:TRAN (@{ch})")
+        self._settle(0.05)
+        self._check_status(id="source_dc1")
+        return self.meas_vi(ch, 0.2)
 
     def source_dcv(self, channel: Union[str, int], volts: float, comply: float):
         """
@@ -242,28 +393,24 @@ class KeysightSMU(IInstrument):
         comply is current limit in amps
         returns v, i measurements
         """
-        channel = str(channel)
+        ch = self._CH[channel]
         forcev = f"{volts}"
-        self._session.write(":SOUR" + channel + ":FUNC:MODE  VOLT")
-        fv = self._session.write(":SOUR" + channel + ":VOLT:LEV:IMM " + forcev)
-        self._session.write(":SOUR" + channel + ":FUNC:SHAP DC")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="source_dcv_0")
-        self._session.write(":SOUR" + channel + ":VOLT:MODE FIX")
-        self._session.write(":SENS" + channel + ":CURR:PROT " + str(comply))
-        # er2 = self._session.query(":SYST:ERR:CODE:ALL?")
-        self._session.write(":OUTP" + channel + ":STAT ON")
-        self._session.write(":INIT:IMM:TRAN (@" + channel + ")")
-        # er3 = self._session.query(":SYST:ERR:CODE:ALL?")
-        # stb1 = self._session.query("*STB?")
-        time.sleep(0.25)
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="source_dcv")
-        return self.smu_meas(channel, 0.2)
+        self._session.write(f":SOUR{ch}:FUNC:MODE  VOLT")
+        fv = self._session.write(f":SOUR{ch}:VOLT:LEV:IMM {forcev}")
+        self._session.write(f":SOUR{ch}:FUNC:SHAP DC")
+        self._session.write(f":SOUR{ch}:VOLT:MODE FIX")
+        self._session.write(f":SENS{ch}:CURR:PROT {comply}")
+        self._session.write(f":OUTP{ch}:STAT ON")
+        self._session.write(f":INIT:IMM:TRAN (@{ch})")
+        self._settle(0.25)
+        self._check_status(id="source_dcv")
+        return self.meas_vi(ch, 0.2)
 
     def channel_off(self, channel: Union[str, int]):
-        channel = str(channel)
-        self._session.write(f":OUTP{channel}:STAT OFF")
-        time.sleep(0.25)
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="channel_off")
+        ch = self._CH[channel]
+        self._session.write(f":OUTP{ch}:STAT OFF")
+        self._settle(0.25)
+        self._check_status(id="channel_off")
 
     # sets up and triggers a scan of self.trig_ct readings at period of self._trigTime
     def initsv_vidaq(self, channel: Union[str, int], curr_range: float = None, four_wire: bool = False) -> str:
@@ -271,56 +418,74 @@ class KeysightSMU(IInstrument):
         initiates scan of smu's trig_ct property readings
         with sample period of smu's aper property seconds
         """
-
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"init_daq0_ch{channel}")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"init_daq1_ch{channel}")
-        self._session.write(f":SENS{channel}:CURR:APER {self.aper}")
-        self._session.write(f":SENS{channel}:REM OFF")
+        ch = self._CH[channel]
+        tpl = self._tpl[ch]
+        cmds = [tpl["aper"] % self.aper, f":SENS{ch}:REM OFF"]
 
         if four_wire:
-            print(f"4-wire enabled = " + self._session.query(f":SENS{channel}:REM?"))
-            self._session.write(f"SENS{channel}:REM {1 if four_wire else 0}")
-            print("4-wire enabled = " + self._session.query(f":SENS{channel}:REM?"))
+            cmds.append(f":SENS{ch}:REM {1 if four_wire else 0}")
 
         if curr_range:
-            self._session.write(f":SENS{channel}:CURR:DC:RANG:UPP {curr_range}")
-            print("range = " + self._session.query(f":SENS{channel}:CURR:DC:RANG:UPP?"))
+            cmds.append(f":SENS{ch}:CURR:DC:RANG:UPP {curr_range}")
         else:
-            self._session.write(f":SENS{channel}:CURR:RANG:AUTO ON")
-
-        self._session.write(f":SENS{channel}:CURR:APER {self.aper}")
-        self._session.write(f":TRIG{channel}:ACQ:SOUR TIM")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"init_daq2_ch{channel}")
-        self._session.write(f":TRIG{channel}:ACQ:TIM {self.trig_time}")
-        self._session.write(f":TRIG{channel}:ACQ:COUN {self.trig_count}")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"init_daq3_ch{channel}")
-        self._session.write(f":OUTP{channel}:STAT ON")
+            cmds.append(f":SENS{ch}:CURR:RANG:AUTO ON")
+
+        cmds += [
+            f":TRIG{ch}:ACQ:SOUR TIM",
+            tpl["trig_tim"] % self.trig_time,
+            tpl["trig_cnt"] % self.trig_count,
+            tpl["outp_on"],
+        ]
+        self._write_many(cmds)
+
+        if four_wire:
+            print("4-wire enabled = " + self._session.query(f":SENS{ch}:REM?"))
+        if curr_range:
+            print("range = " + self._session.query(f":SENS{ch}:CURR:DC:RANG:UPP?"))
+
         log.info(f"starting acq of {self.trig_count} rdgs of V & I every {self.trig_time} seconds")
-        self._session.write(f":INIT:ACQ (@{channel})")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"init_daq4_ch{channel}")
-        stb1 = self._session.query("*STB?")
+        self._session.write(f":INIT:ACQ (@{ch})")
+        stb1 = self._check_status(id=f"init_daq_ch{ch}")
 
         return stb1
 
     # return results from intSV_viDac
-    def fetch_vi(self, channel: Union[str, int]) -> Tuple[List[float], List[float]]:
+    def fetch_vi(self, channel: Union[str, int], wait: bool = False) -> Tuple[np.ndarray, np.ndarray]:
         """
-        return two lists of the scanned v and i values
-
+        return two arrays of the scanned v and i values
+        wait=True blocks on *OPC? until the initsv_vidaq scan completes
         """
-        ch = str(channel)
-
-        # TODO - if measureds returns any values > 1e30, replace with something more indicative of error
-
-        measureds = self._session.query(":FETC:ARR:CURR? (@" + ch + ")")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="fetch1")
-        npI = [float(x) for x in measureds.split(",")]
-        sourceVals = self._session.query(":FETC:ARR:VOLT? (@" + ch + ")")
-        npV = [float(x) for x in sourceVals.split(",")]
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id="fetch2'")
-
+        ch = self._CH[channel]
+        if wait:
+            self._wait_opc(self.trig_count * self.trig_time)
+
+        # keep each fetch and its error query together when fetch_vi_both runs channels in parallel
+        with self._session.lock:
+            npI = self._query_values(f":FETC:ARR:CURR? (@{ch})")
+            stat = self._session.query(":SYST:ERR:CODE:ALL?")
+        if stat != self._OK:
+            self._raise_scpi(stat, "fetch1")
+        with self._session.lock:
+            npV = self._query_values(f":FETC:ARR:VOLT? (@{ch})")
+            stat = self._session.query(":SYST:ERR:CODE:ALL?")
+        if stat != self._OK:
+            self._raise_scpi(stat, "fetch2")
+
+        # the SMU reports invalid readings as 9.91e37 - return those as NaN
+        npI = np.where(npI > 1e30, np.nan, npI)
+        npV = np.where(npV > 1e30, np.nan, npV)
         return npV, npI
 
+    def fetch_vi_both(self) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+        """
+        fetch_vi for channels 1 and 2 from the instance thread pool
+        returns (V1, I1), (V2, I2)
+        """
+        pool = self._get_pool()
+        f1 = pool.submit(self.fetch_vi, Channels.CH1)
+        f2 = pool.submit(self.fetch_vi, Channels.CH2)
+        return f1.result(), f2.result()
+
     def two_channel_qst(self, v_list, aperature):
         """
         For 2902A only - two channel quasi-static transfer curve (qst)
@@ -331,72 +496,61 @@ class KeysightSMU(IInstrument):
         :param aperature:
         :return:  2D array of floats V,I,VI,??,?? by v_list length
         """
-        self._session.write(f":sour1:func:mode volt")
-        self._session.write(f":sour2:func:mode curr")
-        self._session.write("FORM:ELEM:SENS VOLT,CURR")
-        v_str = f"{v_list}"[1:-1]
+        v_str = ",".join(f"{v:.6g}" for v in v_list)
         # make a list of zero amp current source settings for channel 2
-        i_str = ""
-        for ix in range(len(v_list)):
-            i_str += "0.0,"
-        i_str = i_str[0:-1]
-        self._session.write(f":sour1:list:volt {v_str}")
-        self._session.write(f":sour1:volt:mode list")
-        self._session.write(f":sour2:list:curr {i_str}")
-        self._session.write(f":sour2:curr:mode list")
-        actual_v_list = self._session.query("SOUR1:LIST:VOLT?")
-        actual_i_list = self._session.query("SOUR2:LIST:CURR?")
-        self._session.write(f":SENS1:CURR:PROT 0.2")
-        self._session.write(f":SENS2:VOLT:PROT 10.0")
-        # self._session.write(":SOUR2:FUNC:SHAP DC")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini0")
-        self._session.write(':SENS1:FUNC "VOLT","CURR"')
-        self._session.write(':SENS2:FUNC "VOLT","CURR"')
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini2")
-        self._session.write(f":SENS1:CURR:APER {aperature-0.01}")
-        self._session.write(f":SENS2:CURR:APER {aperature-0.01}")
-        self._session.write(f":SENS1:VOLT:APER {aperature-0.01}")
-        self._session.write(f":SENS2:VOLT:APER {aperature-0.01}")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini3")
-        # self._session.write(f":ARM1:SOUR AUTO")
-        # self._session.write(f":ARM2:SOUR AUTO")
+        i_str = ",".join(["0.0"] * len(v_list))
         _count = len(v_list)
-        self._session.write(f":TRIG:SOUR TIM")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini32")
-        self._session.write(f":TRIG:TIM {aperature}")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini31")
-        self._session.write(f":TRIG:COUNT {_count}")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini4")
-        self._session.write(f":OUTP1 ON")
-        self._session.write(f":OUTP2 ON")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini5")
-        self._session.write(f":INIT")
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini6")
-        time.sleep(_count*aperature)
+        self._write_many([
+            ":sour1:func:mode volt",
+            ":sour2:func:mode curr",
+            ":FORM:ELEM:SENS VOLT,CURR",
+            f":sour1:list:volt {v_str}",
+            ":sour1:volt:mode list",
+            f":sour2:list:curr {i_str}",
+            ":sour2:curr:mode list",
+            ":SENS1:CURR:PROT 0.2",
+            ":SENS2:VOLT:PROT 10.0",
+            ':SENS1:FUNC "VOLT","CURR"',
+            ':SENS2:FUNC "VOLT","CURR"',
+            f":SENS1:CURR:APER {aperature-0.01}",
+            f":SENS2:CURR:APER {aperature-0.01}",
+            f":SENS1:VOLT:APER {aperature-0.01}",
+            f":SENS2:VOLT:APER {aperature-0.01}",
+            ":TRIG:SOUR TIM",
+            f":TRIG:TIM {aperature}",
+            f":TRIG:COUNT {_count}",
+            ":OUTP1 ON",
+            ":OUTP2 ON",
+        ])
+        self._check_status(id="qst_setup")
+        self._session.write(":INIT (@1,2)")
+        self._wait_opc(_count*aperature)
         #resp_data = self._session.query("SENS:DATA?").split(',')
-        resp_data = self._session.query("FETC:ARR? (@1,2)").split(',')
-        print(f"{len(resp_data)} values read for list of {_count}")
-        float_data = np.array([float(val) for val in resp_data])
-        float_data_resh = float_data.reshape((4, len(float_data)//4),  order='F')
-        self.err_check(self._session.query(":SYST:ERR:CODE:ALL?"), id=f"ini4")
+        float_data = self._query_values("FETC:ARR? (@1,2)")
+        print(f"{len(float_data)} values read for list of {_count}")
+        float_data_resh = float_data.reshape((4, -1), order='F')
+        self._check_status(id="qst_fetch")
         return float_data_resh
 
     def err_query(self):
         return self._session.query(":SYST:ERR:CODE:ALL?")
 
     def err_check(self, stat: str, id=""):
-        if stat == "+0\n":
+        if stat == self._OK:
             return False
-        else:
-            print(id, self.model)
-            log.info(f"SCPI error: {stat}   {id}")
-            raise ValueError(f"SCPI error {stat}  {id}")
+        self._raise_scpi(stat, id)
+
+    def _raise_scpi(self, stat: str, id=""):
+        print(id, self.model)
+        log.info(f"SCPI error: {stat}   {id}")
+        raise ValueError(f"SCPI error {stat}  {id}")
 
 
 class MockKeysightSMU(MockInstrument):
     def __init__(self, **kwargs):
         super().__init__(identity=kwargs['unique_identifier'])
-        pass
+        self.trig_count = 60
+        self.aper = 0.005
 
     def _get_id(self):
         """  return ID info from IDN? query in open()"""
@@ -415,16 +569,16 @@ class MockKeysightSMU(MockInstrument):
         pass
 
     @staticmethod
-    def _svmi(channel: Union[str, int], volts: float, iLimit: float, settle: float) -> List[float]:
+    def _svmi(channel: Union[str, int], volts: float, iLimit: float, settle: float) -> np.ndarray:
         """
         Source voltage measure current function
         default data format returns a list of values for
         VOLTage|CURRent|RESistance|TIME|STATus|SOUR
         """
-        return [0.0]
+        return np.zeros(1, dtype=np.float64)
 
     @staticmethod
-    def smu_meas(channel: Union[str, int], settle: float) -> (float, float):
+    def smu_meas(channel: Union[str, int], settle: float, curr_range: float = None, four_wire: bool = False, aper_val: float = None, auto_aper: bool = False, combined: bool = False) -> (float, float):
         """
         Waits for time settle and then reads voltage and current
         returns V, I
@@ -433,6 +587,14 @@ class MockKeysightSMU(MockInstrument):
         I = 0.0
         return V, I
 
+    @staticmethod
+    def meas_vi(channel: Union[str, int], settle: float) -> (float, float):
+        return 0.0, 0.0
+
+    @staticmethod
+    def smu_meas_both(settle: float):
+        return (0.0, 0.0), (0.0, 0.0)
+
     @staticmethod
     def source_dci(channel: Union[str, int], amps: float, v_comply: float):
         """
@@ -456,12 +618,17 @@ class MockKeysightSMU(MockInstrument):
         stb1 = "Test STB"
         return stb1
 
-    @staticmethod
-    def fetch_vi(channel: Union[str, int]) -> Tuple[List[float], List[float]]:
-        npV = ([0.0])
-        npI = [0.0]
+    def fetch_vi(self, channel: Union[str, int], wait: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        npV = np.zeros(self.trig_count, dtype=np.float64)
+        npI = np.zeros(self.trig_count, dtype=np.float64)
         return npV, npI
 
+    def fetch_vi_both(self):
+        return self.fetch_vi(Channels.CH1), self.fetch_vi(Channels.CH2)
+
+    def two_channel_qst(self, v_list, aperature) -> np.ndarray:
+        return np.zeros((4, len(v_list)), dtype=np.float64)
+
     @staticmethod
     def err_check(stat: str, id=""):
         return False
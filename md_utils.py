@@ -2,6 +2,7 @@ import os
 import math
 import numpy as np
 from collections import Counter
+from functools import lru_cache
 import pdb
 """    library for generating mark down tables from 2D arrays
 
@@ -9,26 +10,17 @@ import pdb
 
 _print_out =  bool(os.getenv('PRINT_OUT', False))
 
+@lru_cache(maxsize=256)
+def _sep(widths):
+    """ header separator line for a tuple of column widths"""
+    return '|'.join('-' * w for w in widths)
+
 def mdTable_str(str2d):
-    line_lens = []
-    lines_out = []
-    tablestr = ''
-    for i_ in range(len(str2d)):
-        ll = 0
-        for j_ in range(len(str2d[i_])):
-            ll += len(str2d[i_][j_])
-        line_lens.append(ll) 
-    for i_ in range(len(str2d)):
-        pstr = ''
-        for j_ in range(len(str2d[i_])):
-            pstr = pstr +  str2d[i_][j_] + '|'
-        if _print_out:  print(pstr[0:-1])
-        tablestr += pstr[0:-1] + '\n';  lines_out.append(pstr)
+    out = []
+    for i_, row in enumerate(str2d):
+        out.append('|'.join(row))
         if i_ == 0:
-            pstr = ''
-            for k_ in range(len(str2d[i_])):
-                pstr=  pstr + ''.join('-' * len(str2d[i_][k_])) 
-            pstr = pstr + '|'
-            if _print_out:   print(pstr[0:-1])
-            tablestr += pstr[0:-1] + '\n'; lines_out.append(pstr)         
-    return tablestr, lines_out
+            out.append(_sep(tuple(len(c) for c in row)))
+    tablestr = ''.join(l + '\n' for l in out)
+    if _print_out:  print(tablestr, end='')
+    return tablestr, [l + '|' for l in out]